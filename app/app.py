@@ -1,23 +1,165 @@
 from typing import List, Optional, Any, Dict
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError, model_validator
 from pydantic_settings import BaseSettings
 from psycopg_pool import AsyncConnectionPool
 import psycopg
 import httpx
 import json
+import math
+import time
+import asyncio
+import ipaddress
+from collections import deque, OrderedDict
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
 
 # --- settings ---
 class Settings(BaseSettings):
     DATABASE_URL: str
-    RACKET_RUNNER_URL: str
+    DATABASE_REPLICA_URL: Optional[str] = None  # read-only handlers go here when set
+    REPLICA_RYW_TTL_S: float = 30.0             # max time a write pins reads to the primary
+    RACKET_RUNNER_URL: str = ""
+    RACKET_RUNNER_URLS: str = ""            # comma-separated replicas (merged with RACKET_RUNNER_URL)
+    RUNNER_HEALTH_INTERVAL_S: float = 5.0  # active /health probe period
+    RUNNER_HEDGE: bool = False             # send a duplicate to a 2nd replica once p95 is exceeded
+    RUNNER_HEDGE_BUDGET: float = 0.05      # max fraction of calls that may be hedged
+    # /validate admission control
+    VALIDATE_RATE_PER_SEC: float = 2.0     # token refill per username
+    VALIDATE_BURST: int = 10               # per-username bucket capacity
+    VALIDATE_IP_RATE_PER_SEC: float = 30.0 # per client IP; sized for a classroom behind one NAT
+    VALIDATE_IP_BURST: int = 150
+    TRUSTED_PROXIES: str = ""              # comma-separated IPs/CIDRs whose X-Real-IP is believed
+    RUNNER_CONCURRENCY: int = 8            # max in-flight calls per replica (hedges included)
+    RUNNER_QUEUE_MAX: int = 32             # waiters before we shed with 429
+    RUNNER_QUEUE_TIMEOUT_MS: int = 2000    # max time a request may wait for a slot
     class Config:
         env_file = ".env"
 
+    @model_validator(mode="after")
+    def _require_runner(self):
+        if not (self.RACKET_RUNNER_URL.strip() or self.RACKET_RUNNER_URLS.replace(",", "").strip()):
+            raise ValueError("RACKET_RUNNER_URL or RACKET_RUNNER_URLS must be set")
+        return self
+
 settings = Settings()
 pool = AsyncConnectionPool(settings.DATABASE_URL, min_size=1, max_size=10, open=False)
+replica_pool = (
+    AsyncConnectionPool(settings.DATABASE_REPLICA_URL, min_size=1, max_size=10, open=False)
+    if settings.DATABASE_REPLICA_URL else None
+)
+
+# --- read routing (replica + read-your-writes) ---
+# Tokens are primary WAL LSNs held in this process only: read-your-writes
+# holds when the API runs as a single worker (as deployed). With several
+# workers a write and the follow-up read may land on different processes.
+# user_id -> (LSN, recorded_at) of that user's last write; while the replica
+# has not replayed past it, that user's reads go to the primary. Entries
+# older than REPLICA_RYW_TTL_S are dropped (replica lag is assumed smaller).
+_rw_tokens: "OrderedDict[int, tuple]" = OrderedDict()
+# (LSN, recorded_at) of the last lesson/problem write, checked by content reads.
+_content_token: Optional[tuple] = None
+# No replica ever reaches this LSN: pins reads to the primary until the TTL.
+_PIN_PRIMARY = "FFFFFFFF/FFFFFFFF"
+
+async def _primary_lsn(con) -> str:
+    """
+    Call after commit: the primary LSN a later read must see. The write is
+    already committed, so a failure here must not fail the request (a client
+    retry would apply it twice); fall back to pinning reads to the primary.
+    """
+    try:
+        async with con.cursor() as cur:
+            await cur.execute("SELECT pg_current_wal_lsn()::text")
+            (lsn,) = await cur.fetchone()
+        await con.commit()
+        return lsn
+    except Exception:
+        try:
+            await con.rollback()
+        except Exception:
+            pass
+        return _PIN_PRIMARY
+
+async def _note_write(con, user_id: Optional[int]):
+    if replica_pool is None or not user_id:
+        return
+    lsn = await _primary_lsn(con)
+    now = time.monotonic()
+    _rw_tokens[user_id] = (lsn, now)
+    _rw_tokens.move_to_end(user_id)
+    # oldest first: expire from the front
+    while _rw_tokens:
+        uid, (_lsn, at) = next(iter(_rw_tokens.items()))
+        if now - at < settings.REPLICA_RYW_TTL_S:
+            break
+        del _rw_tokens[uid]
+
+async def _note_content_write(con):
+    global _content_token
+    if replica_pool is None:
+        return
+    _content_token = (await _primary_lsn(con), time.monotonic())
+
+def _user_token(user_id: Optional[int]) -> Optional[str]:
+    entry = _rw_tokens.get(user_id) if user_id else None
+    if entry is None:
+        return None
+    if time.monotonic() - entry[1] >= settings.REPLICA_RYW_TTL_S:
+        del _rw_tokens[user_id]
+        return None
+    return entry[0]
+
+def _live_content_token() -> Optional[str]:
+    global _content_token
+    if _content_token is None:
+        return None
+    if time.monotonic() - _content_token[1] >= settings.REPLICA_RYW_TTL_S:
+        _content_token = None
+        return None
+    return _content_token[0]
+
+def _clear_tokens(user_id: Optional[int], user_token: Optional[str], content_token: Optional[str]):
+    global _content_token
+    # only clear what we checked; a newer write may have replaced it meanwhile
+    if user_token is not None and _rw_tokens.get(user_id, (None,))[0] == user_token:
+        del _rw_tokens[user_id]
+    if content_token is not None and _content_token is not None and _content_token[0] == content_token:
+        _content_token = None
+
+@asynccontextmanager
+async def _read_connection(user_id: Optional[int] = None, content: bool = False):
+    """
+    Connection for read-only queries: the replica if configured, unless it
+    has not yet replayed `user_id`'s last write or (with `content`) the last
+    lesson/problem write.
+    """
+    if replica_pool is None:
+        async with pool.connection() as con:
+            yield con
+        return
+
+    user_token = _user_token(user_id)
+    content_token = _live_content_token() if content else None
+    tokens = [t for t in (user_token, content_token) if t is not None]
+    if tokens:
+        async with replica_pool.connection() as con:
+            async with con.cursor() as cur:
+                # NULL replay LSN means the "replica" is not in recovery: treat as current
+                cond = " AND ".join(["pg_last_wal_replay_lsn() >= %s::pg_lsn"] * len(tokens))
+                await cur.execute(f"SELECT COALESCE({cond}, true)", tokens)
+                (caught_up,) = await cur.fetchone()
+            if caught_up:
+                _clear_tokens(user_id, user_token, content_token)
+                yield con
+                return
+        async with pool.connection() as con:
+            yield con
+        return
+
+    async with replica_pool.connection() as con:
+        yield con
 
 # --- app ---
 app = FastAPI(title="S-Expression Lessons API", version="0.4.0")
@@ -45,9 +187,24 @@ class ProblemCreate(BaseModel):
 class ProblemOut(ProblemCreate):
     id: int
 
+class ProblemImport(BaseModel):
+    lesson_title: Optional[str] = None   # implied when nested under a lesson
+    prompt_text: str
+    answer_text: str
+    validator_kind: Optional[str] = None  # NULL -> inherit lesson default
+    validator_spec: Optional[Dict[str, Any]] = None
+
+class LessonImport(BaseModel):
+    title: str
+    body_md: str
+    validator_default: Optional[str] = None
+    validator_spec: Optional[Dict[str, Any]] = None
+    problems: List[ProblemImport] = []
+
 class ValidateReq(BaseModel):
     problem_id: int
     submission: str
+    username: Optional[str] = None   # extra per-user rate limit on top of the client IP one
 
 # class AttemptIn(BaseModel):
 #     username: Optional[str] = None      # preferred: login by username
@@ -93,6 +250,24 @@ class NextReviewOut(BaseModel):
     due_at: datetime
     box: int
 
+class ProblemStatsOut(BaseModel):
+    problem_id: int
+    lesson_id: int
+    attempt_count: int
+    correct_count: int
+    correct_rate: Optional[float]
+    top_error_reason: Optional[str]
+    top_stage: Optional[str]
+
+class LessonStatsOut(BaseModel):
+    lesson_id: int
+    attempt_count: int
+    correct_count: int
+    correct_rate: Optional[float]
+    problems: List[ProblemStatsOut]
+
+VALIDATOR_KINDS = ("cfg", "racket")
+
 # --- SR schedule config (Leitner) ---
 MAX_BOX = 6
 BOX_INTERVALS = {
@@ -107,10 +282,375 @@ BOX_INTERVALS = {
 def _now_utc() -> datetime:
     return datetime.now(timezone.utc)
 
+# --- admission control for /validate ---
+class _TokenBuckets:
+    """Per-key token buckets, least-recently-used keys evicted past MAX_KEYS."""
+    MAX_KEYS = 10_000
+    EVICT_BATCH = 1_000
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = float(burst)
+        self.buckets: "OrderedDict[str, List[float]]" = OrderedDict()  # key -> [tokens, last_refill]
+        self.rejected = 0
+
+    def take(self, key: str) -> float:
+        """Consume one token. Returns 0 if allowed, else seconds until one is available."""
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.MAX_KEYS:
+                # evicting an idle key at worst hands it a fresh (full) bucket
+                for _ in range(self.EVICT_BATCH):
+                    self.buckets.popitem(last=False)
+            bucket = self.buckets[key] = [self.burst, now]
+        else:
+            self.buckets.move_to_end(key)
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= 1.0:
+            bucket[0] = tokens - 1.0
+            return 0.0
+        bucket[0] = tokens
+        self.rejected += 1
+        return (1.0 - tokens) / self.rate
+
+class _RunnerGate:
+    """
+    Bounded queue in front of the racket runner: at most `concurrency` calls
+    in flight, at most `max_waiting` queued. Anything beyond that, or anything
+    that waits longer than `timeout_s`, is shed with 429 so admitted requests
+    keep a predictable latency.
+    """
+    def __init__(self, concurrency: int, max_waiting: int, timeout_s: float):
+        self.concurrency = concurrency
+        self.max_waiting = max_waiting
+        self.timeout_s = timeout_s
+        self.sem = asyncio.Semaphore(concurrency)
+        self.waiting = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+        self.service_ewma_s = 0.1
+
+    def _retry_after(self) -> int:
+        backlog = (self.waiting + 1) / max(self.concurrency, 1)
+        return max(1, math.ceil(backlog * self.service_ewma_s))
+
+    def _shed(self, reason: str):
+        raise HTTPException(429, f"validator busy: {reason}",
+                            headers={"Retry-After": str(self._retry_after())})
+
+    @asynccontextmanager
+    async def slot(self):
+        t0 = time.monotonic()
+        if not self.sem.locked():
+            await self.sem.acquire()  # free slot: returns without suspending
+        else:
+            if self.waiting >= self.max_waiting:
+                self.rejected_full += 1
+                self._shed("queue full")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self.sem.acquire(), self.timeout_s)
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                self._shed("queue wait timeout")
+            finally:
+                self.waiting -= 1
+
+        waited = time.monotonic() - t0
+        self.admitted += 1
+        self.wait_total_s += waited
+        self.wait_max_s = max(self.wait_max_s, waited)
+        self.in_flight += 1
+        t1 = time.monotonic()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.service_ewma_s = 0.8 * self.service_ewma_s + 0.2 * (time.monotonic() - t1)
+            self.sem.release()
+
+    async def try_acquire_extra(self) -> bool:
+        """Take a slot for a hedged duplicate only if one is free now and nobody is queued."""
+        if self.sem.locked() or self.waiting:
+            return False
+        await self.sem.acquire()  # free slot: returns without suspending
+        self.in_flight += 1
+        return True
+
+    def release_extra(self):
+        self.in_flight -= 1
+        self.sem.release()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.waiting,
+            "queue_max": self.max_waiting,
+            "in_flight": self.in_flight,
+            "concurrency": self.concurrency,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_full,
+            "rejected_timeout": self.rejected_timeout,
+            "wait_avg_ms": round(1000 * self.wait_total_s / self.admitted, 2) if self.admitted else 0.0,
+            "wait_max_ms": round(1000 * self.wait_max_s, 2),
+            "service_ewma_ms": round(1000 * self.service_ewma_s, 2),
+        }
+
+# --- racket runner replicas ---
+class _RunnerReplica:
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+
+class _RunnerPool:
+    """
+    Routes runner calls to the healthy replica with the fewest outstanding
+    requests. Replicas are probed on /health in the background and marked
+    down when a connection cannot be made. With hedging on, a duplicate is
+    sent to a second replica once the first has been running longer than the
+    observed p95; whichever succeeds first wins (validation is side-effect
+    free). Hedges are capped at `hedge_budget` of calls and need a free
+    `gate` slot, so they never add load beyond the gate's concurrency.
+    No replica is given more than `per_replica` calls at once (hedges
+    included); when every usable replica is full, callers wait for one to
+    free up, for at most the gate's queue timeout.
+    """
+    HEDGE_MIN_SAMPLES = 20
+    HEDGE_TOKENS_MAX = 10.0
+
+    def __init__(self, urls: List[str], gate: _RunnerGate, per_replica: int, hedge: bool,
+                 hedge_budget: float, health_interval_s: float):
+        self.replicas = [_RunnerReplica(u) for u in urls]
+        self.gate = gate
+        self.per_replica = per_replica
+        self._freed = asyncio.Event()
+        self.rejected_busy = 0
+        self.hedge = hedge
+        self.hedge_budget = hedge_budget
+        self.health_interval_s = health_interval_s
+        # primary-call latency per request; cancelled primaries count with
+        # their elapsed time so hedging does not hide the tail it cuts off
+        self.latencies: deque = deque(maxlen=512)
+        self.client: Optional[httpx.AsyncClient] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._rr = 0
+        self.hedge_tokens = 0.0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    async def start(self):
+        self.client = httpx.AsyncClient(timeout=3.0)
+        if self.replicas:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self):
+        if self._health_task:
+            self._health_task.cancel()
+        if self.client:
+            await self.client.aclose()
+
+    async def _probe(self, replica: _RunnerReplica):
+        try:
+            r = await self.client.get(f"{replica.url}/health", timeout=1.0)
+            replica.healthy = r.status_code == 200
+        except Exception:
+            replica.healthy = False
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.gather(*(self._probe(r) for r in self.replicas))
+            await asyncio.sleep(self.health_interval_s)
+
+    def _pick(self, exclude: Optional[_RunnerReplica] = None) -> Optional[_RunnerReplica]:
+        """Least-loaded usable replica with spare capacity, or None if all are full."""
+        candidates = [r for r in self.replicas if r is not exclude]
+        healthy = [r for r in candidates if r.healthy]
+        candidates = healthy or candidates  # all down: keep trying rather than fail outright
+        candidates = [r for r in candidates if r.outstanding < self.per_replica]
+        if not candidates:
+            return None
+        # rotate the start so ties on `outstanding` spread across replicas
+        # (only primary picks advance the rotation; hedge picks reuse it)
+        if exclude is None:
+            self._rr += 1
+        start = self._rr % len(candidates)
+        rotated = candidates[start:] + candidates[:start]
+        return min(rotated, key=lambda r: r.outstanding)
+
+    def p95_s(self) -> Optional[float]:
+        if len(self.latencies) < self.HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def _spawn(self, replica: _RunnerReplica, body: str) -> asyncio.Task:
+        # reserve at pick time (before the task runs) so concurrent picks see it;
+        # released by done callback, which also fires if cancelled before running
+        replica.outstanding += 1
+        replica.requests += 1
+        task = asyncio.create_task(self._call(replica, body))
+        task.add_done_callback(lambda _t: self._release(replica))
+        return task
+
+    def _release(self, replica: _RunnerReplica):
+        replica.outstanding -= 1
+        self._freed.set()
+        self._freed = asyncio.Event()
+
+    async def _acquire(self) -> _RunnerReplica:
+        deadline = time.monotonic() + self.gate.timeout_s
+        while True:
+            replica = self._pick()
+            if replica is not None:
+                return replica
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.rejected_busy += 1
+                self.gate._shed("all runners busy")
+            try:
+                await asyncio.wait_for(self._freed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _call(self, replica: _RunnerReplica, body: str) -> httpx.Response:
+        try:
+            r = await self.client.post(
+                f"{replica.url}/validate",
+                content=body,
+                headers={"Content-Type": "application/json"},
+            )
+            r.raise_for_status()
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            replica.failures += 1
+            replica.healthy = False
+            raise
+        except Exception:
+            # read timeouts etc. are usually one slow submission, not a dead replica
+            replica.failures += 1
+            raise
+        return r
+
+    async def post_validate(self, payload: Dict[str, Any]) -> httpx.Response:
+        if not self.replicas:
+            raise RuntimeError("no racket runner configured")
+        body = json.dumps(payload)
+        first = await self._acquire()
+        t0 = time.monotonic()
+        self.hedge_tokens = min(self.HEDGE_TOKENS_MAX, self.hedge_tokens + self.hedge_budget)
+        delay = self.p95_s() if self.hedge and len(self.replicas) > 1 else None
+
+        primary = self._spawn(first, body)
+        tasks = [primary]
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and self.hedge_tokens >= 1.0:
+                    # pick now, with current load, not the load from before the wait
+                    second = self._pick(exclude=first)
+                    if second is not None and await self.gate.try_acquire_extra():
+                        self.hedge_tokens -= 1.0
+                        self.hedged += 1
+                        hedge = self._spawn(second, body)
+                        # done callback (not try/finally) so the slot is freed even if cancelled before it runs
+                        hedge.add_done_callback(lambda _t: self.gate.release_extra())
+                        tasks.append(hedge)
+            pending = set(tasks)
+            err: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        if t is not primary:
+                            self.hedge_wins += 1
+                        return t.result()
+                    err = t.exception()
+            raise err
+        finally:
+            if not primary.done() or (not primary.cancelled() and primary.exception() is None):
+                self.latencies.append(time.monotonic() - t0)
+            for t in tasks:
+                if not t.done():
+                    t.cancel()
+
+    def metrics(self) -> Dict[str, Any]:
+        p95 = self.p95_s()
+        return {
+            "hedge": self.hedge,
+            "hedge_budget": self.hedge_budget,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "per_replica": self.per_replica,
+            "rejected_all_busy": self.rejected_busy,
+            "p95_ms": round(1000 * p95, 2) if p95 is not None else None,
+            "replicas": [
+                {"url": r.url, "healthy": r.healthy, "outstanding": r.outstanding,
+                 "requests": r.requests, "failures": r.failures}
+                for r in self.replicas
+            ],
+        }
+
+def _runner_urls() -> List[str]:
+    urls = [u.strip() for u in settings.RACKET_RUNNER_URLS.split(",") if u.strip()]
+    if settings.RACKET_RUNNER_URL and settings.RACKET_RUNNER_URL not in urls:
+        urls.insert(0, settings.RACKET_RUNNER_URL)
+    return urls
+
+user_limiter = _TokenBuckets(settings.VALIDATE_RATE_PER_SEC, settings.VALIDATE_BURST)
+ip_limiter = _TokenBuckets(settings.VALIDATE_IP_RATE_PER_SEC, settings.VALIDATE_IP_BURST)
+
+_urls = _runner_urls()
+runner_gate = _RunnerGate(settings.RUNNER_CONCURRENCY * max(1, len(_urls)), settings.RUNNER_QUEUE_MAX,
+                          settings.RUNNER_QUEUE_TIMEOUT_MS / 1000.0)
+runner_pool = _RunnerPool(_urls, runner_gate, settings.RUNNER_CONCURRENCY,
+                          settings.RUNNER_HEDGE, settings.RUNNER_HEDGE_BUDGET,
+                          settings.RUNNER_HEALTH_INTERVAL_S)
+
+_trusted_proxies = [ipaddress.ip_network(p.strip(), strict=False)
+                    for p in settings.TRUSTED_PROXIES.split(",") if p.strip()]
+
+def _client_ip(request: Request) -> str:
+    # X-Real-IP is only believed from a configured proxy (nginx sets it from
+    # $remote_addr); anyone reaching the API port directly can send any value.
+    # X-Forwarded-For keeps client-supplied entries, so it is never used.
+    peer = request.client.host if request.client else "unknown"
+    real = request.headers.get("x-real-ip")
+    if real and _trusted_proxies:
+        try:
+            addr = ipaddress.ip_address(peer)
+        except ValueError:
+            return peer
+        if any(addr in net for net in _trusted_proxies):
+            return real
+    return peer
+
+def _admit_validate(request: Request, username: Optional[str]):
+    """
+    Every request spends a token from its client IP's bucket; the username
+    (unauthenticated, client-supplied) only adds a tighter per-user bucket on
+    top, so rotating or borrowing names never gets past the IP limit.
+    """
+    wait_s = ip_limiter.take(_client_ip(request))
+    if wait_s <= 0 and username:
+        wait_s = user_limiter.take(username)
+    if wait_s > 0:
+        raise HTTPException(429, "too many submissions, slow down",
+                            headers={"Retry-After": str(max(1, math.ceil(wait_s)))})
+
 # --- lifecycle ---
 @app.on_event("startup")
 async def on_startup():
     await pool.open()
+    if replica_pool is not None:
+        await replica_pool.open()
+    await runner_pool.start()
     ddl = """
     -- LESSON
     CREATE TABLE IF NOT EXISTS lesson (
@@ -175,6 +715,18 @@ async def on_startup():
     );
     CREATE INDEX IF NOT EXISTS idx_user_lesson_review_due
       ON user_lesson_review (user_id, due_at);
+
+    -- PROBLEM STATS (rollup of attempt, maintained on insert)
+    -- error_reason_counts / stage_counts tally incorrect attempts only.
+    CREATE TABLE IF NOT EXISTS problem_stats (
+      problem_id          BIGINT PRIMARY KEY REFERENCES problem(id) ON DELETE CASCADE,
+      lesson_id           BIGINT NOT NULL REFERENCES lesson(id) ON DELETE CASCADE,
+      attempt_count       BIGINT NOT NULL DEFAULT 0,
+      correct_count       BIGINT NOT NULL DEFAULT 0,
+      error_reason_counts JSONB NOT NULL DEFAULT '{}'::jsonb,
+      stage_counts        JSONB NOT NULL DEFAULT '{}'::jsonb,
+      updated_at          TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
     """
     async with pool.connection() as con:
         async with con.cursor() as cur:
@@ -183,6 +735,9 @@ async def on_startup():
 
 @app.on_event("shutdown")
 async def on_shutdown():
+    await runner_pool.close()
+    if replica_pool is not None:
+        await replica_pool.close()
     await pool.close()
 
 # --- health ---
@@ -202,12 +757,13 @@ async def create_lesson(payload: LessonCreate):
             except Exception as e:
                 raise HTTPException(400, str(e))
         await con.commit()
+        await _note_content_write(con)
     return LessonOut(id=row[0], title=row[1], body_md=row[2])
 
 @app.get("/lessons/{lesson_id}", response_model=LessonOut)
 async def get_lesson(lesson_id: int):
     q = "SELECT id, title, body_md FROM lesson WHERE id = %s"
-    async with pool.connection() as con:
+    async with _read_connection(content=True) as con:
         async with con.cursor() as cur:
             await cur.execute(q, (lesson_id,))
             row = await cur.fetchone()
@@ -218,7 +774,7 @@ async def get_lesson(lesson_id: int):
 @app.get("/lessons")
 async def list_lessons():
     q = "SELECT id, title, body_md FROM lesson ORDER BY created_at ASC, id ASC"
-    async with pool.connection() as con:
+    async with _read_connection(content=True) as con:
         async with con.cursor() as cur:
             await cur.execute(q)
             rows = await cur.fetchall()
@@ -238,13 +794,14 @@ async def create_problem(payload: ProblemCreate):
             await cur.execute(q, (payload.lesson_id, payload.prompt_text, payload.answer_text))
             row = await cur.fetchone()
         await con.commit()
+        await _note_content_write(con)
     return ProblemOut(id=row[0], lesson_id=row[1], prompt_text=row[2], answer_text=row[3])
 
 @app.get("/lessons/{lesson_id}/problems", response_model=List[ProblemOut])
 async def list_problems(lesson_id: int):
     q = """SELECT id, lesson_id, prompt_text, answer_text
            FROM problem WHERE lesson_id = %s ORDER BY id"""
-    async with pool.connection() as con:
+    async with _read_connection(content=True) as con:
         async with con.cursor() as cur:
             await cur.execute(q, (lesson_id,))
             rows = await cur.fetchall()
@@ -260,18 +817,186 @@ async def delete_problem(problem_id: int):
             if not row:
                 raise HTTPException(404, "Problem not found")
         await con.commit()
+        await _note_content_write(con)
     return {"deleted_id": row[0]}
 
+# --- bulk import ---
+_IMPORT_STAGE_COLS = ("seq", "kind", "title", "body_md", "validator_default",
+                      "lesson_title", "prompt_text", "answer_text",
+                      "validator_kind", "validator_spec")
+
+async def _import_records(request: Request):
+    """
+    Yield (location, record) pairs from the request body; `location` names the
+    record in error messages. NDJSON records are yielded undecoded (bytes) so
+    a bad line is reported against its own line number.
+    NDJSON (application/x-ndjson): one {"type": "lesson"|"problem", ...} per line, read as it streams.
+    JSON: {"lessons": [...]} or a bare list of lessons, problems nested under each lesson.
+    """
+    ctype = request.headers.get("content-type", "")
+    if "ndjson" in ctype or "jsonl" in ctype:
+        buf = b""
+        lineno = 0
+        async for chunk in request.stream():
+            buf += chunk
+            *lines, buf = buf.split(b"\n")
+            for line in lines:
+                lineno += 1
+                if line.strip():
+                    yield f"line {lineno}", line
+        if buf.strip():
+            yield f"line {lineno + 1}", buf
+        return
+
+    try:
+        bundle = json.loads(await request.body())
+    except ValueError as e:
+        raise ValueError(f"bundle: {e}")
+    lessons = bundle.get("lessons") if isinstance(bundle, dict) else bundle
+    if not isinstance(lessons, list):
+        raise ValueError('bundle: expected {"lessons": [...]} or a list of lessons')
+    for i, lesson in enumerate(lessons, 1):
+        yield f"lesson {i}", {"type": "lesson", **lesson} if isinstance(lesson, dict) else lesson
+
+def _stage_rows(raw: Dict[str, Any]):
+    """Validate one raw record and turn it into import_stage rows (minus seq)."""
+    kind = raw.get("type", "lesson")
+    if kind == "lesson":
+        lesson = LessonImport.model_validate(raw)
+        if lesson.validator_default is not None and lesson.validator_default not in VALIDATOR_KINDS:
+            raise ValueError(f"unknown validator_default: {lesson.validator_default}")
+        yield ("lesson", lesson.title, lesson.body_md, lesson.validator_default, None, None, None, None,
+               json.dumps(lesson.validator_spec) if lesson.validator_spec is not None else None)
+        problems = [p.model_copy(update={"lesson_title": p.lesson_title or lesson.title})
+                    for p in lesson.problems]
+    elif kind == "problem":
+        problems = [ProblemImport.model_validate(raw)]
+    else:
+        raise ValueError(f"unknown record type: {kind}")
+
+    for p in problems:
+        if not p.lesson_title:
+            raise ValueError("problem needs lesson_title")
+        if p.validator_kind is not None and p.validator_kind not in VALIDATOR_KINDS:
+            raise ValueError(f"unknown validator_kind: {p.validator_kind}")
+        yield ("problem", None, None, None, p.lesson_title, p.prompt_text, p.answer_text, p.validator_kind,
+               json.dumps(p.validator_spec) if p.validator_spec is not None else None)
+
+@app.post("/import")
+async def import_course(request: Request):
+    """
+    Bulk-load a course bundle in one transaction.
+    Lessons are upserted by title and problems by (lesson, prompt_text);
+    on update, omitted validator fields keep their current value.
+    """
+    async with pool.connection() as con:
+        async with con.cursor() as cur:
+            await cur.execute("""
+                CREATE TEMP TABLE import_stage (
+                  seq BIGINT NOT NULL,
+                  kind TEXT NOT NULL,
+                  title TEXT, body_md TEXT, validator_default TEXT,
+                  lesson_title TEXT, prompt_text TEXT, answer_text TEXT,
+                  validator_kind TEXT, validator_spec JSONB
+                ) ON COMMIT DROP
+            """)
+
+            n = seq = 0
+            where = None
+            async with cur.copy(f"COPY import_stage ({', '.join(_IMPORT_STAGE_COLS)}) FROM STDIN") as copy:
+                try:
+                    async for where, raw in _import_records(request):
+                        n += 1
+                        if isinstance(raw, bytes):
+                            raw = json.loads(raw)
+                        if not isinstance(raw, dict):
+                            raise ValueError("record must be a JSON object")
+                        for row in _stage_rows(raw):
+                            seq += 1
+                            await copy.write_row((seq,) + row)
+                except (ValueError, ValidationError) as e:
+                    # json.JSONDecodeError is a ValueError too; bundle-level
+                    # errors carry their own "bundle:" prefix
+                    raise HTTPException(400, f"import {where}: {e}" if where else f"import {e}")
+
+            # Serialize imports from here on: the problem upsert relies on
+            # NOT EXISTS (no unique key on lesson_id, prompt_text), so two
+            # concurrent imports would otherwise both insert. Taken after the
+            # COPY so a slow upload does not hold other imports up.
+            await cur.execute("SELECT pg_advisory_xact_lock(hashtext('sxpr:import'))")
+
+            lessons_sql = """(SELECT DISTINCT ON (title) * FROM import_stage
+                              WHERE kind = 'lesson' ORDER BY title, seq DESC)"""
+            await cur.execute(f"""
+                UPDATE lesson l
+                SET body_md = s.body_md,
+                    validator_default = COALESCE(s.validator_default, l.validator_default),
+                    validator_spec = COALESCE(s.validator_spec, l.validator_spec)
+                FROM {lessons_sql} s
+                WHERE l.title = s.title
+            """)
+            lessons_updated = cur.rowcount
+            await cur.execute(f"""
+                INSERT INTO lesson (title, body_md, validator_default, validator_spec)
+                SELECT s.title, s.body_md,
+                       COALESCE(s.validator_default, 'cfg'), COALESCE(s.validator_spec, '{{}}'::jsonb)
+                FROM {lessons_sql} s
+                WHERE NOT EXISTS (SELECT 1 FROM lesson l WHERE l.title = s.title)
+                ORDER BY s.seq
+                ON CONFLICT (title) DO NOTHING
+            """)
+            lessons_inserted = cur.rowcount
+
+            await cur.execute("""
+                SELECT DISTINCT s.lesson_title FROM import_stage s
+                WHERE s.kind = 'problem'
+                  AND NOT EXISTS (SELECT 1 FROM lesson l WHERE l.title = s.lesson_title)
+            """)
+            missing = [r[0] for r in await cur.fetchall()]
+            if missing:
+                raise HTTPException(404, f"Lesson not found: {', '.join(sorted(missing))}")
+
+            problems_sql = """(SELECT DISTINCT ON (lesson_title, prompt_text) * FROM import_stage
+                               WHERE kind = 'problem' ORDER BY lesson_title, prompt_text, seq DESC)"""
+            await cur.execute(f"""
+                UPDATE problem p
+                SET answer_text = s.answer_text,
+                    validator_kind = COALESCE(s.validator_kind, p.validator_kind),
+                    validator_spec = COALESCE(s.validator_spec, p.validator_spec)
+                FROM {problems_sql} s
+                JOIN lesson l ON l.title = s.lesson_title
+                WHERE p.lesson_id = l.id AND p.prompt_text = s.prompt_text
+            """)
+            problems_updated = cur.rowcount
+            await cur.execute(f"""
+                INSERT INTO problem (lesson_id, prompt_text, answer_text, validator_kind, validator_spec)
+                SELECT l.id, s.prompt_text, s.answer_text, s.validator_kind, s.validator_spec
+                FROM {problems_sql} s
+                JOIN lesson l ON l.title = s.lesson_title
+                WHERE NOT EXISTS (SELECT 1 FROM problem p
+                                  WHERE p.lesson_id = l.id AND p.prompt_text = s.prompt_text)
+                ORDER BY s.seq
+            """)
+            problems_inserted = cur.rowcount
+        await con.commit()
+        await _note_content_write(con)
+
+    return {"records": n,
+            "lessons_inserted": lessons_inserted, "lessons_updated": lessons_updated,
+            "problems_inserted": problems_inserted, "problems_updated": problems_updated}
+
 # --- validate ---
 @app.post("/validate")
-async def validate(req: ValidateReq):
+async def validate(req: ValidateReq, request: Request):
+    _admit_validate(request, req.username)
+
     q = """SELECT p.id, p.prompt_text, p.answer_text,
                   l.validator_default, l.validator_spec,
                   p.validator_kind, p.validator_spec
            FROM problem p
            JOIN lesson l ON l.id = p.lesson_id
            WHERE p.id = %s"""
-    async with pool.connection() as con:
+    async with _read_connection(content=True) as con:
         async with con.cursor() as cur:
             await cur.execute(q, (req.problem_id,))
             row = await cur.fetchone()
@@ -304,23 +1029,26 @@ async def validate(req: ValidateReq):
             "mem_mb": spec.get("mem_mb", 64),
             "tests": spec.get("tests", [])
         }
-        try:
-            async with httpx.AsyncClient(timeout=3.0) as client:
-                r = await client.post(
-                    f"{settings.RACKET_RUNNER_URL}/validate",
-                    content=json.dumps(payload),
-                    headers={"Content-Type": "application/json"},
-                )
-            r.raise_for_status()
-            data = r.json()
-            if isinstance(data.get("details"), str):
-                data["details"] = {"message": data["details"]}
-            return data
-        except Exception as e:
-            raise HTTPException(400, f"racket runner error: {e}")
+        async with runner_gate.slot():
+            try:
+                r = await runner_pool.post_validate(payload)
+                data = r.json()
+                if isinstance(data.get("details"), str):
+                    data["details"] = {"message": data["details"]}
+                return data
+            except Exception as e:
+                raise HTTPException(400, f"racket runner error: {e}")
 
     raise HTTPException(400, f"Unknown validator kind: {kind}")
 
+@app.get("/metrics/validate")
+async def validate_metrics():
+    out = runner_gate.metrics()
+    out["rate_limited_ip"] = ip_limiter.rejected
+    out["rate_limited_user"] = user_limiter.rejected
+    out["runners"] = runner_pool.metrics()
+    return out
+
 # --- internal helpers: spaced repetition ---
 async def _ensure_review_rows_for_unlocked_lessons(con, user_id: int):
     """
@@ -389,6 +1117,124 @@ async def _bump_review_after_attempt(con, user_id: Optional[int], problem_id: in
             WHERE user_id = %s AND lesson_id = %s
         """, (next_box, due_at, user_id, lesson_id))
 
+# --- internal helpers: problem stats rollup ---
+async def _bump_problem_stats(con, problem_id: int, is_correct: bool,
+                              stage: Optional[str], error_reason: Optional[str]):
+    """
+    Fold one attempt into the problem_stats rollup row (upsert).
+    Stage / error_reason are only tallied for incorrect attempts.
+    """
+    fail_stage = None if is_correct else stage
+    fail_reason = None if is_correct else error_reason
+    async with con.cursor() as cur:
+        await cur.execute("""
+            INSERT INTO problem_stats
+              (problem_id, lesson_id, attempt_count, correct_count,
+               error_reason_counts, stage_counts, updated_at)
+            SELECT p.id, p.lesson_id, 1, %(ok)s::int,
+                   CASE WHEN %(reason)s::text IS NULL THEN '{}'::jsonb
+                        ELSE jsonb_build_object(%(reason)s::text, 1) END,
+                   CASE WHEN %(stage)s::text IS NULL THEN '{}'::jsonb
+                        ELSE jsonb_build_object(%(stage)s::text, 1) END,
+                   NOW()
+            FROM problem p
+            WHERE p.id = %(pid)s
+            ON CONFLICT (problem_id) DO UPDATE SET
+              attempt_count = problem_stats.attempt_count + 1,
+              correct_count = problem_stats.correct_count + EXCLUDED.correct_count,
+              error_reason_counts = CASE
+                WHEN %(reason)s::text IS NULL THEN problem_stats.error_reason_counts
+                ELSE jsonb_set(problem_stats.error_reason_counts, ARRAY[%(reason)s::text],
+                       to_jsonb(COALESCE((problem_stats.error_reason_counts ->> %(reason)s::text)::bigint, 0) + 1))
+              END,
+              stage_counts = CASE
+                WHEN %(stage)s::text IS NULL THEN problem_stats.stage_counts
+                ELSE jsonb_set(problem_stats.stage_counts, ARRAY[%(stage)s::text],
+                       to_jsonb(COALESCE((problem_stats.stage_counts ->> %(stage)s::text)::bigint, 0) + 1))
+              END,
+              updated_at = NOW()
+        """, {"pid": problem_id, "ok": bool(is_correct), "reason": fail_reason, "stage": fail_stage})
+
+async def _rebuild_problem_stats(con, batch_size: int = 200) -> int:
+    """
+    Recompute problem_stats from attempt (backfill / repair), committing per
+    batch of problems; returns the number of rows written.
+    Each batch locks its problem rows FOR UPDATE, which waits out in-flight
+    attempts on those problems and holds off new ones (the attempt FK check
+    takes KEY SHARE) only for the duration of that batch.
+    """
+    total = 0
+    last_id = 0
+    while True:
+        async with con.cursor() as cur:
+            await cur.execute("""
+                SELECT id FROM problem WHERE id > %s ORDER BY id LIMIT %s FOR UPDATE
+            """, (last_id, batch_size))
+            ids = [r[0] for r in await cur.fetchall()]
+            if not ids:
+                await con.commit()
+                return total
+
+            await cur.execute("DELETE FROM problem_stats WHERE problem_id = ANY(%s)", (ids,))
+            await cur.execute("""
+                WITH batch AS (
+                  SELECT * FROM attempt WHERE problem_id = ANY(%(ids)s)
+                ),
+                totals AS (
+                  SELECT problem_id,
+                         COUNT(*) AS attempt_count,
+                         COUNT(*) FILTER (WHERE is_correct) AS correct_count
+                  FROM batch
+                  GROUP BY problem_id
+                ),
+                reasons AS (
+                  SELECT problem_id, jsonb_object_agg(error_reason, n) AS counts
+                  FROM (SELECT problem_id, error_reason, COUNT(*) AS n
+                        FROM batch
+                        WHERE NOT is_correct AND error_reason IS NOT NULL
+                        GROUP BY problem_id, error_reason) r
+                  GROUP BY problem_id
+                ),
+                stages AS (
+                  SELECT problem_id, jsonb_object_agg(stage, n) AS counts
+                  FROM (SELECT problem_id, stage, COUNT(*) AS n
+                        FROM batch
+                        WHERE NOT is_correct AND stage IS NOT NULL
+                        GROUP BY problem_id, stage) s
+                  GROUP BY problem_id
+                )
+                INSERT INTO problem_stats
+                  (problem_id, lesson_id, attempt_count, correct_count,
+                   error_reason_counts, stage_counts, updated_at)
+                SELECT p.id, p.lesson_id, t.attempt_count, t.correct_count,
+                       COALESCE(r.counts, '{}'::jsonb), COALESCE(s.counts, '{}'::jsonb), NOW()
+                FROM totals t
+                JOIN problem p ON p.id = t.problem_id
+                LEFT JOIN reasons r ON r.problem_id = t.problem_id
+                LEFT JOIN stages s ON s.problem_id = t.problem_id
+            """, {"ids": ids})
+            total += cur.rowcount
+        await con.commit()
+        last_id = ids[-1]
+
+def _top_key(counts: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not counts:
+        return None
+    return max(counts.items(), key=lambda kv: (int(kv[1]), kv[0]))[0]
+
+def _problem_stats_out(problem_id: int, lesson_id: int, attempts: int, correct: int,
+                       reason_counts: Optional[Dict[str, Any]],
+                       stage_counts: Optional[Dict[str, Any]]) -> ProblemStatsOut:
+    return ProblemStatsOut(
+        problem_id=problem_id,
+        lesson_id=lesson_id,
+        attempt_count=attempts,
+        correct_count=correct,
+        correct_rate=(correct / attempts) if attempts else None,
+        top_error_reason=_top_key(reason_counts),
+        top_stage=_top_key(stage_counts),
+    )
+
 # # --- attempts ---
 # @app.post("/attempts")
 # async def create_attempt(a: AttemptIn):
@@ -451,11 +1297,11 @@ async def create_attempt(a: AttemptIn):
                 ))
                 row = await cur.fetchone()
 
-            # SR bump (same txn)
+            # SR bump + stats rollup (same txn)
             await _bump_review_after_attempt(con, resolved_user_id, a.problem_id, a.is_correct)
+            await _bump_problem_stats(con, a.problem_id, a.is_correct, a.stage, a.error_reason)
 
             await con.commit()
-            return {"id": row[0], "created_at": row[1]}
 
         except psycopg.errors.ForeignKeyViolation:
             await con.rollback()
@@ -466,6 +1312,9 @@ async def create_attempt(a: AttemptIn):
             # show a helpful message during dev
             raise HTTPException(400, f"attempt insert failed: {e}")
 
+        await _note_write(con, resolved_user_id)
+    return {"id": row[0], "created_at": row[1]}
+
 
 # --- users ---
 @app.post("/users", response_model=UserOut)
@@ -515,12 +1364,18 @@ async def create_user(payload: UserCreate):
 @app.get("/users/{user_id}", response_model=UserOut)
 async def get_user(user_id: int):
     q = 'SELECT user_id, username, active_lesson, lessons FROM public."user" WHERE user_id = %s'
-    async with pool.connection() as con:
+    async with _read_connection(user_id) as con:
         async with con.cursor() as cur:
             await cur.execute(q, (user_id,))
             row = await cur.fetchone()
-            if not row:
-                raise HTTPException(404, "User not found")
+    if not row and replica_pool is not None:
+        # may be a brand-new user the replica has not seen yet
+        async with pool.connection() as con:
+            async with con.cursor() as cur:
+                await cur.execute(q, (user_id,))
+                row = await cur.fetchone()
+    if not row:
+        raise HTTPException(404, "User not found")
     return UserOut(user_id=row[0], username=row[1], active_lesson=row[2], lessons=row[3])
 
 @app.get("/users/by-username/{username}", response_model=UserOut)
@@ -622,6 +1477,7 @@ async def advance_user_to_next_lesson(user_id: int):
             await _ensure_review_rows_for_unlocked_lessons(con, updated[0])
 
         await con.commit()
+        await _note_write(con, updated[0])
 
     return UserOut(user_id=updated[0], username=updated[1], active_lesson=updated[2], lessons=updated[3])
 
@@ -679,20 +1535,26 @@ async def advance_user_to_next_lesson_by_username(username: str):
             await _ensure_review_rows_for_unlocked_lessons(con, updated[0])
 
         await con.commit()
+        await _note_write(con, updated[0])
 
     return UserOut(user_id=updated[0], username=updated[1], active_lesson=updated[2], lessons=updated[3])
 
 # --- reporting: last attempt per lesson ---
 @app.get("/users/by-username/{username}/last-attempts-per-lesson", response_model=List[LastAttemptPerLesson])
 async def last_attempts_per_lesson_by_username(username: str):
-    # resolve user_id
-    async with pool.connection() as con:
+    # resolve user_id (usernames never change, so the replica is fine unless the user is brand new)
+    async with _read_connection() as con:
         async with con.cursor() as cur:
             await cur.execute('SELECT user_id FROM public."user" WHERE username = %s', (username,))
             row = await cur.fetchone()
-            if not row:
-                raise HTTPException(404, "User not found")
-            user_id = row[0]
+    if not row and replica_pool is not None:
+        async with pool.connection() as con:
+            async with con.cursor() as cur:
+                await cur.execute('SELECT user_id FROM public."user" WHERE username = %s', (username,))
+                row = await cur.fetchone()
+    if not row:
+        raise HTTPException(404, "User not found")
+    user_id = row[0]
 
     q = """
     WITH joined AS (
@@ -714,7 +1576,7 @@ async def last_attempts_per_lesson_by_username(username: str):
     WHERE rn = 1
     ORDER BY lesson_id
     """
-    async with pool.connection() as con:
+    async with _read_connection(user_id) as con:
         async with con.cursor() as cur:
             await cur.execute(q, (user_id,))
             rows = await cur.fetchall()
@@ -728,6 +1590,57 @@ async def last_attempts_per_lesson_by_username(username: str):
         for r in rows
     ]
 
+# --- reporting: problem difficulty stats ---
+@app.get("/problems/{problem_id}/stats", response_model=ProblemStatsOut)
+async def get_problem_stats(problem_id: int):
+    q = """SELECT p.id, p.lesson_id,
+                  COALESCE(s.attempt_count, 0), COALESCE(s.correct_count, 0),
+                  s.error_reason_counts, s.stage_counts
+           FROM problem p
+           LEFT JOIN problem_stats s ON s.problem_id = p.id
+           WHERE p.id = %s"""
+    async with _read_connection(content=True) as con:
+        async with con.cursor() as cur:
+            await cur.execute(q, (problem_id,))
+            row = await cur.fetchone()
+            if not row:
+                raise HTTPException(404, "Problem not found")
+    return _problem_stats_out(*row)
+
+@app.get("/lessons/{lesson_id}/stats", response_model=LessonStatsOut)
+async def get_lesson_stats(lesson_id: int):
+    q = """SELECT p.id, p.lesson_id,
+                  COALESCE(s.attempt_count, 0), COALESCE(s.correct_count, 0),
+                  s.error_reason_counts, s.stage_counts
+           FROM problem p
+           LEFT JOIN problem_stats s ON s.problem_id = p.id
+           WHERE p.lesson_id = %s
+           ORDER BY p.id"""
+    async with _read_connection(content=True) as con:
+        async with con.cursor() as cur:
+            await cur.execute("SELECT 1 FROM lesson WHERE id = %s", (lesson_id,))
+            if not await cur.fetchone():
+                raise HTTPException(404, "Lesson not found")
+            await cur.execute(q, (lesson_id,))
+            rows = await cur.fetchall()
+
+    problems = [_problem_stats_out(*r) for r in rows]
+    attempts = sum(p.attempt_count for p in problems)
+    correct = sum(p.correct_count for p in problems)
+    return LessonStatsOut(
+        lesson_id=lesson_id,
+        attempt_count=attempts,
+        correct_count=correct,
+        correct_rate=(correct / attempts) if attempts else None,
+        problems=problems,
+    )
+
+@app.post("/admin/problem-stats/rebuild")
+async def rebuild_problem_stats():
+    async with pool.connection() as con:
+        rows = await _rebuild_problem_stats(con)
+    return {"rebuilt": rows}
+
 # --- spaced repetition: next review ---
 @app.get("/users/by-username/{username}/next-review", response_model=Optional[NextReviewOut])
 async def next_review_by_username(username: str):
@@ -760,3 +1673,20 @@ async def next_review_by_username(username: str):
     if not row:
         return None
     return NextReviewOut(lesson_id=row[0], due_at=row[1], box=row[2])
+
+# --- cli: python app.py rebuild-problem-stats ---
+if __name__ == "__main__":
+    import sys
+
+    async def _cli_rebuild_problem_stats():
+        await pool.open()
+        try:
+            async with pool.connection() as con:
+                rows = await _rebuild_problem_stats(con)
+            print(f"problem_stats rebuilt: {rows} rows")
+        finally:
+            await pool.close()
+
+    if sys.argv[1:] != ["rebuild-problem-stats"]:
+        sys.exit("usage: python app.py rebuild-problem-stats")
+    asyncio.run(_cli_rebuild_problem_stats())
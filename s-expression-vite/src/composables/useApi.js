@@ -20,11 +20,11 @@ export function useApi() {
         return await res.json()
     }
 
-    const backendValidate = async (problemId, submission) => {
+    const backendValidate = async (problemId, submission, username = null) => {
         const res = await fetch(`${API_BASE}/validate`, {
             method: "POST",
             headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ problem_id: problemId, submission }),
+            body: JSON.stringify({ problem_id: problemId, submission, username }),
         })
         if (!res.ok) {
             const text = await res.text().catch(() => "")
@@ -114,7 +114,7 @@ export function usePractice(api, auth, lessons) {
             }
 
 
-            const res = await api.backendValidate(p.id, input)
+            const res = await api.backendValidate(p.id, input, auth.username.value)
             await api.recordAttempt(auth.username.value, p.id, input, res)
 
             console.log(input, exact_answer, input == exact_answer)
@@ -127,7 +127,7 @@ export function useReview(api, auth, lessons) {
             reviewLoading.value = true
 
             // validate
-            const res = await api.backendValidate(currentProblemForReview.value.id, text)
+            const res = await api.backendValidate(currentProblemForReview.value.id, text, auth.username.value)
             const ok = !!res?.ok
 
             // RECORD ATTEMPT